@@ -3,12 +3,19 @@
 Open Unreal Engine project in Rider after optionally generating project files and compiling.
 """
 
-import argparse
+import atexit
+import glob
 import json
 import os
 import subprocess
 import sys
-from pathlib import Path
+import types
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 
 class Colors:
@@ -20,26 +27,99 @@ class Colors:
     RESET = '\033[0m'
 
 
-def print_colored(message, color=Colors.RESET):
-    """Print a colored message."""
-    print(f"{color}{message}{Colors.RESET}")
+# Log levels; messages below the current level are dropped before any formatting
+INFO, WARN, ERROR = 0, 1, 2
+_log_level = INFO
+
+
+def set_log_level(level):
+    """Set the minimum level of messages that get printed."""
+    global _log_level
+    _log_level = level
+
+
+# Color currently active on stdout; consecutive lines in the same color
+# skip the escape codes and the reset is deferred until it is needed
+_active_color = None
+# Set while a background process writes to the same console; every line
+# then carries its own reset so the child's output is never colored
+_console_shared = False
+
+
+def set_console_shared(shared):
+    """Mark whether a background process is currently writing to stdout."""
+    global _console_shared
+    reset_color()
+    _console_shared = shared
+
+
+def _write_colored(color, args):
+    """Write the space-joined args as a single colored line."""
+    global _active_color
+    text = ' '.join(map(str, args))
+    if _console_shared:
+        sys.stdout.write(''.join((color, text, Colors.RESET, '\n')))
+        sys.stdout.flush()
+    elif color == _active_color:
+        sys.stdout.write(text + '\n')
+    else:
+        sys.stdout.write(''.join((color, text, '\n')))
+        _active_color = color
+
+
+def reset_color():
+    """Restore the default terminal color before anything else writes to the console."""
+    global _active_color
+    if _active_color is not None:
+        sys.stdout.write(Colors.RESET)
+        sys.stdout.flush()
+        _active_color = None
+
+
+atexit.register(reset_color)
+
+
+def log_info(*args):
+    """Print an informational message."""
+    if _log_level <= INFO:
+        _write_colored(Colors.CYAN, args)
+
+
+def log_ok(*args):
+    """Print a success message."""
+    if _log_level <= INFO:
+        _write_colored(Colors.GREEN, args)
+
+
+def log_warn(*args):
+    """Print a warning message."""
+    if _log_level <= WARN:
+        _write_colored(Colors.YELLOW, args)
+
+
+def log_err(*args):
+    """Print an error message."""
+    if _log_level <= ERROR:
+        _write_colored(Colors.RED, args)
 
 
 def create_config_interactive(config_path):
     """Create config file by prompting user for values."""
-    print_colored("Config file not found. Let's create one!", Colors.CYAN)
-    print_colored("Please provide the following information:\n", Colors.CYAN)
+    log_info("Config file not found. Let's create one!")
+    log_info("Please provide the following information:\n")
     
     # Get Unreal Engine path
+    reset_color()
     unreal_engine_path = input("Enter Unreal Engine repository path: ").strip()
     if not unreal_engine_path:
-        print_colored("Error: Unreal Engine path cannot be empty.", Colors.RED)
+        log_err("Error: Unreal Engine path cannot be empty.")
         sys.exit(1)
     
     # Get project file path
+    reset_color()
     project_file = input("Enter path to .sln or .uproject file: ").strip()
     if not project_file:
-        print_colored("Error: Project file path cannot be empty.", Colors.RED)
+        log_err("Error: Project file path cannot be empty.")
         sys.exit(1)
     
     # Create config dictionary
@@ -52,177 +132,384 @@ def create_config_interactive(config_path):
     try:
         with open(config_path, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=4)
-        print_colored(f"\nConfig file created successfully at {config_path}!", Colors.GREEN)
+        log_ok(f"\nConfig file created successfully at {config_path}!")
         return config
     except Exception as e:
-        print_colored(f"Error creating config file: {e}", Colors.RED)
+        log_err(f"Error creating config file: {e}")
         sys.exit(1)
 
 
 def load_config(config_path):
     """Load configuration from JSON file, or create one if it doesn't exist."""
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        with open(config_path, 'rb') as f:
+            config = _json_loads(f.read())
         
         # Validate that required keys exist
         if 'UnrealEnginePath' not in config or 'ProjectFile' not in config:
-            print_colored("Warning: Config file is missing required fields. Recreating...", Colors.YELLOW)
+            log_warn("Warning: Config file is missing required fields. Recreating...")
             return create_config_interactive(config_path)
         
         return config
     except FileNotFoundError:
         return create_config_interactive(config_path)
     except json.JSONDecodeError as e:
-        print_colored(f"Error: Invalid JSON in config file: {e}", Colors.RED)
-        print_colored("Recreating config file...", Colors.YELLOW)
+        log_err(f"Error: Invalid JSON in config file: {e}")
+        log_warn("Recreating config file...")
         return create_config_interactive(config_path)
 
 
-def find_rider_executable():
-    """Find Rider executable in common installation locations."""
-    rider_paths = [
-        os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Programs', 'Rider', 'bin', 'rider64.exe'),
-        os.path.join(os.environ.get('ProgramFiles', ''), 'JetBrains', 'Rider', 'bin', 'rider64.exe'),
-        os.path.join(os.environ.get('ProgramFiles(x86)', ''), 'JetBrains', 'Rider', 'bin', 'rider64.exe'),
+def _rider_candidates():
+    """Yield possible Rider executable paths, most common locations first."""
+    # Skip locations whose environment variable is unset; joining onto an
+    # empty base would only produce a relative path that can never match
+    bases = [
+        (os.environ.get('LOCALAPPDATA'), 'Programs'),
+        (os.environ.get('ProgramFiles'), 'JetBrains'),
+        (os.environ.get('ProgramFiles(x86)'), 'JetBrains'),
     ]
+    for base, subdir in bases:
+        if base:
+            yield os.path.join(base, subdir, 'Rider', 'bin', 'rider64.exe')
     
     # Check user's home directory for JetBrains Rider installations
     # Pattern: %USERPROFILE%\JetBrains Rider <version>\bin\rider64.exe
     user_profile = os.environ.get('USERPROFILE', '')
     if user_profile:
+        # A single pattern only descends into "JetBrains Rider*" folders and
+        # yields nothing (instead of raising) if the profile can't be read
+        pattern = os.path.join(glob.escape(user_profile), 'JetBrains Rider*', 'bin', 'rider64.exe')
+        yield from glob.iglob(pattern)
+
+
+def find_rider_executable():
+    """Find Rider executable in common installation locations."""
+    # Candidates are generated lazily so the user profile is only scanned
+    # when none of the standard install locations exist.
+    return next((path for path in _rider_candidates() if os.path.exists(path)), None)
+
+
+def get_rider_executable(config, config_path):
+    """Return the Rider path cached in config, rediscovering and saving it if stale or missing."""
+    rider_exe = config.get('RiderExecutable')
+    if rider_exe and os.path.exists(rider_exe):
+        return rider_exe
+    
+    rider_exe = find_rider_executable()
+    if rider_exe:
+        config['RiderExecutable'] = rider_exe
         try:
-            # Look for folders matching "JetBrains Rider*" in user profile
-            for item in os.listdir(user_profile):
-                if item.startswith('JetBrains Rider'):
-                    rider_dir = os.path.join(user_profile, item)
-                    if os.path.isdir(rider_dir):
-                        rider_exe = os.path.join(rider_dir, 'bin', 'rider64.exe')
-                        if os.path.exists(rider_exe):
-                            rider_paths.append(rider_exe)
-        except (OSError, PermissionError):
-            pass
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=4)
+        except OSError as e:
+            log_warn(f"Warning: Could not save Rider path to config file: {e}")
+    return rider_exe
+
+
+def find_unreal_build_tool(unreal_engine_path):
+    """Find UnrealBuildTool.exe in the engine, checking the UE5 location before the UE4 one."""
+    dotnet_dir = os.path.join(unreal_engine_path, 'Engine', 'Binaries', 'DotNET')
+    ubt_paths = [
+        os.path.join(dotnet_dir, 'UnrealBuildTool', 'UnrealBuildTool.exe'),
+        os.path.join(dotnet_dir, 'UnrealBuildTool.exe'),
+    ]
+    return next((path for path in ubt_paths if os.path.isfile(path)), None)
+
+
+def bundled_dotnet_env(unreal_engine_path):
+    """Return an environment using the engine's bundled .NET like GetDotnetPath.bat does, or None if there is none."""
+    # Engine/Binaries/ThirdParty/DotNet/<version>/windows (or win-x64 in newer engines)
+    pattern = os.path.join(glob.escape(unreal_engine_path), 'Engine', 'Binaries', 'ThirdParty', 'DotNet', '*', 'win*')
+    dotnet_roots = sorted(path for path in glob.glob(pattern) if os.path.isfile(os.path.join(path, 'dotnet.exe')))
+    if not dotnet_roots:
+        return None
     
-    for path in rider_paths:
-        if os.path.exists(path):
-            return path
-    return None
+    dotnet_root = dotnet_roots[-1]
+    env = dict(os.environ)
+    env['DOTNET_ROOT'] = dotnet_root
+    env['PATH'] = dotnet_root + os.pathsep + env.get('PATH', '')
+    env['DOTNET_MULTILEVEL_LOOKUP'] = '0'
+    return env
+
 
+def scan_directory(path):
+    """Return a {name: DirEntry} map of a directory, or None if it cannot be listed."""
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name: entry for entry in entries}
+    except OSError:
+        return None
+
+
+def is_file(path, entries=None):
+    """Check that path is a regular file, using a cached DirEntry from scan_directory when available."""
+    entry = entries.get(os.path.basename(path)) if entries else None
+    if entry is not None:
+        return entry.is_file()
+    # Not in the listing (e.g. different letter case on Windows), so ask the filesystem
+    return os.path.isfile(path)
 
-def run_command(command, args=None, cwd=None):
+
+def _spawn_and_wait(cmd, cwd=None):
+    """Run a command with inherited stdio via os.spawnv on Windows and return the exit code."""
+    # spawnv joins arguments with spaces, so quote each one like subprocess would
+    argv = [subprocess.list2cmdline([arg]) for arg in cmd]
+    
+    previous_cwd = os.getcwd() if cwd else None
+    if cwd:
+        os.chdir(cwd)
+    try:
+        return os.spawnv(os.P_WAIT, cmd[0], argv)
+    finally:
+        if previous_cwd:
+            os.chdir(previous_cwd)
+
+
+def run_command(command, args=None, cwd=None, env=None):
     """Run a command and return the exit code."""
     cmd = [command]
     if args:
         cmd.extend(args)
     
+    reset_color()
+    
+    # On Windows spawnv skips the Popen bookkeeping subprocess.run needs and
+    # raises OSError if the command can't be started, so subprocess can report it.
+    # POSIX spawnv forks before exec and only returns 127 on failure, so it is not used there.
+    if os.name == 'nt' and env is None:
+        try:
+            return _spawn_and_wait(cmd, cwd)
+        except OSError:
+            pass
+    
     try:
-        result = subprocess.run(cmd, cwd=cwd, check=False)
+        result = subprocess.run(cmd, cwd=cwd, env=env, check=False)
         return result.returncode
     except Exception as e:
-        print_colored(f"Error running command: {e}", Colors.RED)
+        log_err(f"Error running command: {e}")
         return 1
 
 
-def main():
+def start_command(command, args=None, cwd=None, env=None):
+    """Start a command without waiting for it and return the process, or None on failure."""
+    cmd = [command]
+    if args:
+        cmd.extend(args)
+    
+    reset_color()
+    try:
+        return subprocess.Popen(cmd, cwd=cwd, env=env)
+    except Exception as e:
+        log_err(f"Error running command: {e}")
+        return None
+
+
+def launch_detached(cmd):
+    """Start a GUI application detached from this console so the script can exit right away."""
+    kwargs = {
+        'stdin': subprocess.DEVNULL,
+        'stdout': subprocess.DEVNULL,
+        'stderr': subprocess.DEVNULL,
+        'close_fds': True,
+    }
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    return subprocess.Popen(cmd, **kwargs)
+
+
+def open_rider(project_file, config, config_path):
+    """Open Rider with the project file and return whether it was launched."""
+    log_info(f"Opening Rider with project file: {project_file}")
+    
+    rider_exe = get_rider_executable(config, config_path)
+    
+    if rider_exe:
+        try:
+            launch_detached([rider_exe, project_file])
+            log_ok("Rider opened successfully!")
+            return True
+        except Exception as e:
+            log_err(f"Error opening Rider: {e}")
+            return False
+    else:
+        log_warn("Rider executable not found. Attempting to open with 'rider' command...")
+        try:
+            launch_detached(['rider', project_file])
+            log_ok("Rider opened successfully!")
+            return True
+        except Exception as e:
+            log_err("Error: Could not find Rider. Please update the script with the correct Rider path.")
+            log_err(f"Error details: {e}")
+            return False
+
+
+DEFAULT_ARGS = {
+    'generate_project_files': False,
+    'config': 'config.json',
+    'parallel_launch': False,
+    'rider_launch_delay': 10.0,
+    'quiet': False,
+    'direct_ubt': False,
+}
+
+
+def parse_args(argv):
+    """Parse command line arguments, skipping argparse entirely when there are none."""
+    if not argv:
+        return types.SimpleNamespace(**DEFAULT_ARGS)
+    
+    import argparse
     parser = argparse.ArgumentParser(description='Open Unreal Engine project in Rider')
     parser.add_argument('--generate-project-files', action='store_true',
                         help='Generate project files before opening Rider')
-    parser.add_argument('--config', type=str, default='config.json',
+    parser.add_argument('--config', type=str,
                         help='Path to config JSON file (default: config.json)')
+    parser.add_argument('--parallel-launch', action='store_true',
+                        help='Open Rider while Development Editor is still compiling')
+    parser.add_argument('--rider-launch-delay', type=float,
+                        help='Seconds to wait after the build starts before opening Rider '
+                             'with --parallel-launch (default: 10)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Only print warnings and errors')
+    parser.add_argument('--direct-ubt', action='store_true',
+                        help='Compile by running UnrealBuildTool.exe directly instead of through Build.bat')
+    # Share the defaults with the no-argument path above
+    parser.set_defaults(**DEFAULT_ARGS)
     
-    args = parser.parse_args()
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.quiet:
+        set_log_level(WARN)
     
     # Load configuration
-    script_dir = Path(__file__).parent
-    config_path = script_dir / args.config
+    script_dir = os.path.dirname(__file__) or '.'
+    config_path = os.path.join(script_dir, args.config)
     config = load_config(config_path)
     
-    unreal_engine_path = Path(config['UnrealEnginePath']).resolve()
-    project_file = Path(config['ProjectFile']).resolve()
+    unreal_engine_path = os.path.abspath(config['UnrealEnginePath'])
+    project_file = os.path.abspath(config['ProjectFile'])
     
-    if not unreal_engine_path.exists():
-        print_colored(f"Error: Unreal Engine path does not exist: {unreal_engine_path}", Colors.RED)
+    # List the engine root once; later file checks are answered from these entries
+    engine_entries = scan_directory(unreal_engine_path)
+    if engine_entries is None:
+        log_err(f"Error: Unreal Engine path does not exist: {unreal_engine_path}")
         sys.exit(1)
     
-    if not project_file.exists():
-        print_colored(f"Error: Project file does not exist: {project_file}", Colors.RED)
+    # os.access follows symlinks like Path.exists() but skips opening a handle on Windows
+    if not os.access(project_file, os.F_OK):
+        log_err(f"Error: Project file does not exist: {project_file}")
         sys.exit(1)
     
     should_open_rider = True
+    rider_opened = None
     
     try:
         # Run GenerateProjectFiles.bat if requested
         if args.generate_project_files:
-            print_colored("Running GenerateProjectFiles.bat...", Colors.CYAN)
+            log_info("Running GenerateProjectFiles.bat...")
             
-            generate_bat = unreal_engine_path / "GenerateProjectFiles.bat"
-            if not generate_bat.exists():
-                print_colored(f"Error: GenerateProjectFiles.bat not found at {generate_bat}", Colors.RED)
+            generate_bat = os.path.join(unreal_engine_path, "GenerateProjectFiles.bat")
+            if not is_file(generate_bat, engine_entries):
+                log_err(f"Error: GenerateProjectFiles.bat not found at {generate_bat}")
                 sys.exit(1)
             
-            exit_code = run_command(str(generate_bat), cwd=str(unreal_engine_path))
+            exit_code = run_command(generate_bat, cwd=unreal_engine_path)
             
             if exit_code != 0:
-                print_colored(f"GenerateProjectFiles.bat failed with exit code: {exit_code}", Colors.RED)
+                log_err(f"GenerateProjectFiles.bat failed with exit code: {exit_code}")
                 should_open_rider = False
                 sys.exit(exit_code)
             else:
-                print_colored("GenerateProjectFiles.bat completed successfully!", Colors.GREEN)
+                log_ok("GenerateProjectFiles.bat completed successfully!")
         
         # Compile Development Editor
         if should_open_rider:
-            print_colored("Compiling Development Editor...", Colors.CYAN)
+            log_info("Compiling Development Editor...")
             
-            project_name = project_file.stem
-            build_bat = unreal_engine_path / "Engine" / "Build" / "BatchFiles" / "Build.bat"
+            project_name = os.path.splitext(os.path.basename(project_file))[0]
+            batch_files_dir = os.path.join(unreal_engine_path, "Engine", "Build", "BatchFiles")
+            build_bat = os.path.join(batch_files_dir, "Build.bat")
+            build_command = None
+            build_env = None
             
-            if build_bat.exists():
+            if args.direct_ubt and not project_file.lower().endswith('.uproject'):
+                # UnrealBuildTool's -Project= only accepts a .uproject
+                log_warn("Warning: --direct-ubt requires a .uproject ProjectFile. Falling back to Build.bat.")
+            elif args.direct_ubt:
+                # Skip cmd.exe: UnrealBuildTool <ProjectName>Editor Win64 Development -Project=<ProjectPath> -WaitMutex
+                build_command = find_unreal_build_tool(unreal_engine_path)
+                if build_command:
+                    # Build.bat would otherwise point UBT at the engine's bundled .NET
+                    build_env = bundled_dotnet_env(unreal_engine_path)
+                    build_args = [
+                        f"{project_name}Editor",
+                        "Win64",
+                        "Development",
+                        f"-Project={project_file}",
+                        "-WaitMutex"
+                    ]
+                else:
+                    log_warn("Warning: UnrealBuildTool.exe not found. Falling back to Build.bat.")
+            
+            if build_command is None and is_file(build_bat, scan_directory(batch_files_dir)):
                 # Build command: Build.bat <ProjectName>Editor Win64 Development <ProjectPath>
+                build_command = build_bat
                 build_args = [
                     f"{project_name}Editor",
                     "Win64",
                     "Development",
-                    str(project_file)
+                    project_file
                 ]
-                
-                exit_code = run_command(str(build_bat), args=build_args, cwd=str(unreal_engine_path))
+            
+            if build_command:
+                if args.parallel_launch:
+                    process = start_command(build_command, args=build_args, cwd=unreal_engine_path, env=build_env)
+                    if process is None:
+                        exit_code = 1
+                    else:
+                        set_console_shared(True)
+                        try:
+                            # Give the build a head start, then let Rider load while it finishes
+                            try:
+                                exit_code = process.wait(timeout=args.rider_launch_delay)
+                            except subprocess.TimeoutExpired:
+                                exit_code = None
+                            
+                            if exit_code in (None, 0):
+                                rider_opened = open_rider(project_file, config, config_path)
+                            
+                            if exit_code is None:
+                                exit_code = process.wait()
+                        finally:
+                            set_console_shared(False)
+                else:
+                    exit_code = run_command(build_command, args=build_args, cwd=unreal_engine_path, env=build_env)
                 
                 if exit_code != 0:
-                    print_colored(f"Compilation failed with exit code: {exit_code}", Colors.RED)
+                    log_err(f"Compilation failed with exit code: {exit_code}")
                     should_open_rider = False
                     sys.exit(exit_code)
                 else:
-                    print_colored("Compilation completed successfully!", Colors.GREEN)
+                    log_ok("Compilation completed successfully!")
             else:
-                print_colored(f"Warning: Build.bat not found at {build_bat}. Skipping compilation.", Colors.YELLOW)
-                print_colored(f"Current directory: {os.getcwd()}", Colors.YELLOW)
-                print_colored(f"UnrealEnginePath: {unreal_engine_path}", Colors.YELLOW)
+                log_warn(f"Warning: Build.bat not found at {build_bat}. Skipping compilation.")
+                log_warn(f"Current directory: {os.getcwd()}")
+                log_warn(f"UnrealEnginePath: {unreal_engine_path}")
         
         # Open Rider with the project file
-        if should_open_rider:
-            print_colored(f"Opening Rider with project file: {project_file}", Colors.CYAN)
-            
-            rider_exe = find_rider_executable()
-            
-            if rider_exe:
-                try:
-                    subprocess.Popen([rider_exe, str(project_file)])
-                    print_colored("Rider opened successfully!", Colors.GREEN)
-                except Exception as e:
-                    print_colored(f"Error opening Rider: {e}", Colors.RED)
-                    sys.exit(1)
-            else:
-                print_colored("Rider executable not found. Attempting to open with 'rider' command...", Colors.YELLOW)
-                try:
-                    subprocess.Popen(['rider', str(project_file)])
-                    print_colored("Rider opened successfully!", Colors.GREEN)
-                except Exception as e:
-                    print_colored("Error: Could not find Rider. Please update the script with the correct Rider path.", Colors.RED)
-                    print_colored(f"Error details: {e}", Colors.RED)
-                    sys.exit(1)
+        if should_open_rider and rider_opened is None:
+            rider_opened = open_rider(project_file, config, config_path)
+        
+        if rider_opened is False:
+            sys.exit(1)
     
     except Exception as e:
-        print_colored(f"Error: {e}", Colors.RED)
+        log_err(f"Error: {e}")
         sys.exit(1)
 
 